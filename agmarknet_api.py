@@ -76,20 +76,14 @@ class AgmarknetClient:
         return df
 
 
-def fetch_basmati_prices_csv(
-    out_csv: str,
-    state: Optional[str] = None,
-    market: Optional[str] = None,
-    variety_keywords: Optional[List[str]] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None,
-    commodity_name: str = "Paddy",
-) -> str:
-    """Fetch basmati-related mandi prices filtered by variety keywords and save to CSV.
-    Defaults to commodity='Paddy' because Agmarknet often lists basmati as paddy varieties.
-    Example varieties: ['Basmati', '1121', '1509', '1718', 'PB-1']
-    Returns the path of the written CSV.
-    """
+def _fetch_basmati_rows(
+    state: Optional[str],
+    market: Optional[str],
+    variety_keywords: Optional[List[str]],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    commodity_name: str,
+) -> pd.DataFrame:
     client = AgmarknetClient()
     df = client.prices(
         commodity=commodity_name,
@@ -101,27 +95,71 @@ def fetch_basmati_prices_csv(
         limit=100000,
     )
     if df.empty:
-        pd.DataFrame(columns=['Date','Price']).to_csv(out_csv, index=False)
-        return out_csv
+        return df
 
     # Filter basmati-like varieties
     if variety_keywords:
         pat = "|".join([str(x) for x in variety_keywords])
         mask = df['Variety'].str.contains(pat, case=False, na=False)
         df = df[mask].copy()
+    return df
 
-    # Aggregate to a single daily price (Modal) per day; you can change to Min/Max/Avg
+def _row_price(df: pd.DataFrame) -> pd.Series:
+    # Modal price per row; you can change to Min/Max/Avg
     if 'ModalPrice' in df.columns:
-        daily = df.groupby('Date', as_index=False)['ModalPrice'].mean().rename(columns={'ModalPrice':'Price'})
-    elif 'MaxPrice' in df.columns and 'MinPrice' in df.columns:
-        tmp = df.groupby('Date', as_index=False)[['MinPrice','MaxPrice']].mean()
-        tmp['Price'] = (tmp['MinPrice'] + tmp['MaxPrice'])/2.0
-        daily = tmp[['Date','Price']]
-    else:
-        # Fallback: count as NaN
-        daily = df.groupby('Date', as_index=False).size().rename(columns={'size':'Price'})
-        daily['Price'] = float('nan')
+        return pd.to_numeric(df['ModalPrice'], errors='coerce')
+    if 'MaxPrice' in df.columns and 'MinPrice' in df.columns:
+        return (pd.to_numeric(df['MinPrice'], errors='coerce') + pd.to_numeric(df['MaxPrice'], errors='coerce')) / 2.0
+    return pd.Series(float('nan'), index=df.index)
+
+def fetch_basmati_prices_csv(
+    out_csv: str,
+    state: Optional[str] = None,
+    market: Optional[str] = None,
+    variety_keywords: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    commodity_name: str = "Paddy",
+) -> str:
+    """Fetch basmati-related mandi prices filtered by variety keywords and save to CSV.
+    Defaults to commodity='Paddy' because Agmarknet often lists basmati as paddy varieties.
+    Example varieties: ['Basmati', '1121', '1509', '1718', 'PB-1']
+    Returns the path of the written CSV.
+    """
+    df = _fetch_basmati_rows(state, market, variety_keywords, date_from, date_to, commodity_name)
+    if df.empty:
+        pd.DataFrame(columns=['Date','Price']).to_csv(out_csv, index=False)
+        return out_csv
 
+    # Aggregate to a single daily price per day
+    daily = df.assign(Price=_row_price(df)).groupby('Date', as_index=False)['Price'].mean()
     daily = daily.sort_values('Date')
     daily.to_csv(out_csv, index=False)
     return out_csv
+
+PANEL_COLUMNS = ['Date', 'State', 'Market', 'Variety', 'Price']
+
+def fetch_basmati_panel_csv(
+    out_csv: str,
+    state: Optional[str] = None,
+    market: Optional[str] = None,
+    variety_keywords: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    commodity_name: str = "Paddy",
+) -> str:
+    """Like `fetch_basmati_prices_csv` but keeps one daily price per (State, Market, Variety)
+    instead of collapsing everything into one series. Input for the hierarchical forecast.
+    Returns the path of the written CSV (columns: Date,State,Market,Variety,Price).
+    """
+    df = _fetch_basmati_rows(state, market, variety_keywords, date_from, date_to, commodity_name)
+    if df.empty:
+        pd.DataFrame(columns=PANEL_COLUMNS).to_csv(out_csv, index=False)
+        return out_csv
+
+    panel = (df.assign(Price=_row_price(df))
+               .groupby(PANEL_COLUMNS[:-1], as_index=False)['Price'].mean()
+               .dropna(subset=['Price'])
+               .sort_values(PANEL_COLUMNS[:-1]))
+    panel.to_csv(out_csv, index=False)
+    return out_csv
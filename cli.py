@@ -5,7 +5,8 @@ sys.path.append(str(pathlib.Path(__file__).resolve().parent))
 import typer
 from typing import List, Optional
 from basmati.pipeline import run_pipeline
-from basmati.data_sources.agmarknet_api import fetch_basmati_prices_csv
+from basmati.hierarchy import run_hierarchy
+from basmati.data_sources.agmarknet_api import fetch_basmati_prices_csv, fetch_basmati_panel_csv
 from basmati.data_sources.data_gov_india import fetch_datagov_prices_csv
 
 app = typer.Typer(help="Basmati Forecast CLI")
@@ -18,6 +19,13 @@ def run_all(
 ):
     run_pipeline(config_path=config, horizons=horizons)
 
+@app.command("run-hierarchy")
+def run_hierarchy_cmd(
+    config: str = typer.Option("basmati/config.yaml", help="Path to config file"),
+    horizons: Optional[List[int]] = typer.Option(None, help="List of forecast horizons in days, e.g. --horizons 7 30 180"),
+):
+    run_hierarchy(config_path=config, horizons=horizons)
+
 @app.command("fetch-agmarknet")
 def fetch_agmarknet(
     out_csv: str = typer.Option("data/basmati_prices.csv", help="Where to save the filtered CSV"),
@@ -27,9 +35,11 @@ def fetch_agmarknet(
     date_from: str = typer.Option(None, help="Start date YYYY-MM-DD"),
     date_to: str = typer.Option(None, help="End date YYYY-MM-DD"),
     commodity_name: str = typer.Option("Paddy", help="Commodity name (often 'Paddy' for basmati varieties)"),
+    panel: bool = typer.Option(False, help="Keep one series per State/Market/Variety (input for run-hierarchy)"),
 ):
     keys = [k.strip() for k in variety_keywords.split(',') if k.strip()]
-    path = fetch_basmati_prices_csv(
+    fetch = fetch_basmati_panel_csv if panel else fetch_basmati_prices_csv
+    path = fetch(
         out_csv=out_csv,
         state=state,
         market=market,
@@ -0,0 +1,222 @@
+
+from __future__ import annotations
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+
+from .utils import load_config, ensure_dir, today_str
+from .pipeline import build_exog_features, build_features, make_future_features_builder
+from .model.train import train_models
+from .model.infer import predict_residuals
+
+TOTAL = "Total"
+
+@dataclass
+class Hierarchy:
+    nodes: List[str]        # top-down: Total, then each level; the last n_bottom are the leaves
+    depth: List[int]        # 0 = Total, len(levels) = leaf
+    S: sp.csr_matrix        # (n_nodes, n_bottom); aggregate rows average their leaves
+    bottom: pd.DataFrame    # daily leaf prices; NaN before each leaf's first price
+
+    @property
+    def n_bottom(self) -> int:
+        return self.S.shape[1]
+
+    def series(self) -> pd.DataFrame:
+        """Every node's daily price, coherent with the leaves through S.
+
+        An aggregate is NaN until all of its leaves have a price, so each node keeps its own
+        span instead of every node being cut to the youngest leaf.
+        """
+        vals = self.S @ self.bottom.to_numpy().T
+        return pd.DataFrame(vals.T, index=self.bottom.index, columns=self.nodes)
+
+def load_panel_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    if "Date" not in df.columns or "Price" not in df.columns:
+        raise ValueError(f"Panel CSV must contain columns 'Date' and 'Price'. Found: {df.columns.tolist()}")
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df
+
+def build_hierarchy(panel: pd.DataFrame, levels: Sequence[str] = ("State", "Market", "Variety"),
+                    min_history_days: int = 180) -> Hierarchy:
+    """Build the level tree (e.g. State > Market > Variety) from a long price panel.
+
+    Leaves are resampled to daily with forward-fill and leaves with fewer than
+    `min_history_days` observed days are dropped. Each leaf keeps its own start date.
+    """
+    levels = list(levels)
+    missing = [c for c in levels if c not in panel.columns]
+    if missing:
+        raise ValueError(f"Panel is missing level columns {missing}. Found: {panel.columns.tolist()}")
+    panel = panel.dropna(subset=levels + ["Price"])
+    keys = panel[levels].astype(str).apply(lambda c: c.str.strip().str.replace("/", "-")).agg("/".join, axis=1)
+    wide = (panel.assign(node=keys)
+                 .pivot_table(index="Date", columns="node", values="Price", aggfunc="mean")
+                 .sort_index())
+    keep = wide.notna().sum() >= min_history_days
+    if not keep.all():
+        print(f"Dropped {int((~keep).sum())} series with fewer than {min_history_days} observations: "
+              f"{', '.join(wide.columns[~keep])}")
+    wide = wide.loc[:, keep]
+    if wide.empty:
+        raise ValueError(f"No {'/'.join(levels)} series with at least {min_history_days} observations")
+    wide = wide.asfreq("D").ffill()
+
+    leaves = sorted(wide.columns)
+    nodes, depth, rows, cols, vals = [], [], [], [], []
+    for d in range(len(levels) + 1):
+        groups = {}
+        for j, leaf in enumerate(leaves):
+            name = "/".join(leaf.split("/")[:d]) if d else TOTAL
+            groups.setdefault(name, []).append(j)
+        for name in sorted(groups):
+            members = groups[name]
+            i = len(nodes)
+            nodes.append(name)
+            depth.append(d)
+            rows += [i] * len(members)
+            cols += members
+            vals += [1.0 / len(members)] * len(members)
+    S = sp.csr_matrix((vals, (rows, cols)), shape=(len(nodes), len(leaves)))
+    return Hierarchy(nodes=nodes, depth=depth, S=S, bottom=wide[leaves])
+
+def _shrink_cov(E: np.ndarray) -> np.ndarray:
+    # Schafer-Strimmer shrinkage of the residual covariance towards its diagonal
+    T = E.shape[0]
+    cov = E.T @ E / T
+    sd = np.sqrt(np.clip(np.diag(cov), 1e-12, None))
+    Xs = E / sd
+    corr = Xs.T @ Xs / T
+    v = ((Xs ** 2).T @ (Xs ** 2) - T * corr ** 2) / (T * (T - 1))
+    np.fill_diagonal(v, 0.0)
+    off = corr - np.diag(np.diag(corr))
+    lam = float(np.clip(v.sum() / max((off ** 2).sum(), 1e-12), 0.0, 1.0))
+    shrunk = (1.0 - lam) * cov
+    np.fill_diagonal(shrunk, np.diag(cov))
+    return shrunk
+
+def reconcile(base: np.ndarray, S: sp.csr_matrix, method: str = "bottom_up",
+              residuals: Optional[np.ndarray] = None) -> np.ndarray:
+    """Coherent forecasts for every node from base forecasts of shape (n_nodes, horizon).
+
+    bottom_up: aggregate the leaf forecasts. wls / mint_shrink: MinT with a diagonal or
+    shrunk covariance of the in-sample residuals (shape (T, n_nodes)).
+    """
+    n_bottom = S.shape[1]
+    if method == "bottom_up":
+        return S @ base[-n_bottom:]
+    if residuals is None or len(residuals) < 2:
+        raise ValueError(f"Reconciliation method '{method}' needs in-sample residuals")
+    Sd = S.toarray()
+    if method == "wls":
+        w = np.clip(np.mean(residuals ** 2, axis=0), 1e-12, None)
+        WinvS = Sd / w[:, None]
+    elif method == "mint_shrink":
+        WinvS = np.linalg.solve(_shrink_cov(residuals), Sd)
+    else:
+        raise ValueError(f"Unknown reconciliation method '{method}'")
+    # G = (S' W^-1 S)^-1 S' W^-1
+    G = np.linalg.solve(Sd.T @ WinvS, WinvS.T)
+    return Sd @ (G @ base)
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name)
+
+def _fit_node(name: str, series: pd.Series, exog: pd.DataFrame, cfg: dict, models_dir: str, max_h: int):
+    series = series.rename("price")
+    model_cfg = cfg.get("model", {})
+    feats = build_features(series, cfg, exog=exog)
+    tr = train_models(
+        series=series,
+        features=feats,
+        artifacts_dir=os.path.join(models_dir, _slug(name)),
+        sarimax_cfg=model_cfg.get("sarimax", {}),
+        xgb_cfg=model_cfg.get("xgboost", {}),
+        test_size_days=model_cfg.get("test_size_days", 60),
+    )
+    mean = tr.sarimax.get_forecast(steps=max_h).predicted_mean.to_numpy()
+    if tr.xgb is not None:
+        fut_idx = pd.date_range(series.index.max() + pd.Timedelta(days=1), periods=max_h, freq="D")
+        fut = make_future_features_builder(cfg, exog=exog)(series, fut_idx)
+        mean = mean + predict_residuals(tr.xgb, fut)
+    # train_models already drops the diffuse start-up rows, whose one-step errors
+    # would dominate the MinT covariance
+    return mean, tr.residuals, tr.metrics
+
+def run_hierarchy(
+    config_path: str = "basmati/config.yaml",
+    horizons: Optional[List[int]] = None,
+    artifacts_root: str = "artifacts",
+    progress: Optional[Callable[[str, float], None]] = None,
+) -> dict:
+    """Forecast every node of the variety/market/state tree and reconcile them."""
+    def _report(stage: str, frac: float):
+        if progress is not None:
+            progress(stage, frac)
+
+    _report("load", 0.0)
+    cfg = load_config(config_path)
+    h_cfg = cfg.get("hierarchy", {})
+    method = h_cfg.get("method", "wls")
+    hier = build_hierarchy(load_panel_csv(h_cfg["panel_csv"]),
+                           levels=h_cfg.get("levels", ["State", "Market", "Variety"]),
+                           min_history_days=h_cfg.get("min_history_days", 180))
+    all_series = hier.series()
+    starts = all_series.apply(pd.Series.first_valid_index)
+    late = (starts - starts.min()).dt.days
+    for name in late.index[late > 0]:
+        print(f"{name}: history starts {starts[name]:%Y-%m-%d}, {late[name]} days after the earliest leaf")
+
+    hz = horizons or cfg.get("horizons", [7, 30, 180])
+    max_h = max(hz)
+    fut_idx = pd.date_range(all_series.index.max() + pd.Timedelta(days=1), periods=max_h, freq="D")
+
+    # Indicators and weather are fetched once and shared by every node
+    _report("features", 0.1)
+    exog = build_exog_features(all_series.index.append(fut_idx), cfg)
+
+    out_root = os.path.join(artifacts_root, today_str(), "hierarchy")
+    ensure_dir(out_root)
+    models_dir = os.path.join(artifacts_root, "models", "hierarchy")
+    ensure_dir(models_dir)
+
+    # Bottom-up only needs the leaves; MinT also needs base forecasts for the aggregates
+    _report("train", 0.2)
+    first = len(hier.nodes) - hier.n_bottom if method == "bottom_up" else 0
+    fit_nodes = hier.nodes[first:]
+    fits = Parallel(n_jobs=h_cfg.get("n_jobs", -1))(
+        delayed(_fit_node)(name, all_series[name].dropna(), exog, cfg, models_dir, max_h) for name in fit_nodes
+    )
+
+    _report("reconcile", 0.9)
+    base = np.full((len(hier.nodes), max_h), np.nan)
+    base[first:] = np.vstack([f[0] for f in fits])
+    residuals = None
+    if method != "bottom_up":
+        # Nodes start on different dates; the covariance uses only the dates they all share
+        residuals = pd.concat([f[1] for f in fits], axis=1).dropna().to_numpy()
+    reconciled = reconcile(base, hier.S, method=method, residuals=residuals)
+
+    outputs = {}
+    for h in hz:
+        df = pd.DataFrame({
+            "date": np.tile(fut_idx[:h], len(hier.nodes)),
+            "node": np.repeat(hier.nodes, h),
+            "level": np.repeat(hier.depth, h),
+            "base": base[:, :h].ravel(),
+            "forecast": reconciled[:, :h].ravel(),
+        })
+        df.to_csv(os.path.join(out_root, f"forecast_{h}d.csv"), index=False)
+        outputs[h] = df
+
+    _report("done", 1.0)
+    metrics = dict(zip(fit_nodes, (f[2] for f in fits)))
+    print(f"Reconciled {len(hier.nodes)} nodes ({hier.n_bottom} leaves) with {method}.")
+    print(f"Done. Artifacts at: {out_root}")
+    return {"out_dir": out_root, "metrics": metrics, "horizons": list(hz), "outputs": outputs}
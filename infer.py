@@ -6,6 +6,8 @@ import numpy as np
 from typing import Optional, Tuple
 from statsmodels.tsa.statespace.sarimax import SARIMAXResults
 import joblib
+import xgboost
+from .intervals import simulate_quantiles
 import matplotlib.pyplot as plt
 
 def load_sarimax(path: str) -> SARIMAXResults:
@@ -16,6 +18,14 @@ def load_xgb(path: Optional[str]):
         return joblib.load(path)
     return None
 
+def predict_residuals(xgb, features: pd.DataFrame) -> np.ndarray:
+    """Residual correction from either a native Booster (current artifacts) or an XGBRegressor."""
+    if isinstance(xgb, xgboost.Booster):
+        cols = xgb.feature_names or list(features.columns)
+        X = np.ascontiguousarray(features[cols].to_numpy(dtype=np.float32))
+        return xgb.inplace_predict(X)
+    return xgb.predict(features)
+
 def forecast(
     sarimax_path: str,
     xgb_path: str | None,
@@ -24,6 +34,8 @@ def forecast(
     horizons: list[int],
     out_dir: str,
     title_prefix: str = "forecast",
+    correction_errors_path: str | None = None,
+    intervals_cfg: dict | None = None,
 ):
     os.makedirs(out_dir, exist_ok=True)
     sarimax_res = load_sarimax(sarimax_path)
@@ -39,13 +51,36 @@ def forecast(
     fut_idx = pd.date_range(history_series.index.max() + pd.Timedelta(days=1), periods=max_h, freq='D')
     fut_features = feature_maker(history_series, fut_idx)
 
+    resid_adj = None
     if xgb is not None and fut_features is not None and not fut_features.empty:
-        resid_adj = pd.Series(xgb.predict(fut_features), index=fut_idx)
+        resid_adj = pd.Series(predict_residuals(xgb, fut_features), index=fut_idx)
         adj_mean = base_mean.copy()
         adj_mean.loc[fut_idx] = base_mean.values + resid_adj.values
     else:
         adj_mean = base_mean
 
+    # Simulated hybrid intervals: SARIMAX paths + residual correction + bootstrapped correction errors
+    intervals_cfg = intervals_cfg or {}
+    n_paths = intervals_cfg.get("n_paths", 5000)
+    quantiles = [float(q) for q in intervals_cfg.get("quantiles", [0.025, 0.975])]
+    q_values = {}
+    if n_paths:
+        errors = None
+        if resid_adj is not None and correction_errors_path and os.path.exists(correction_errors_path):
+            errors = np.load(correction_errors_path)
+        all_q = sorted(set(quantiles) | {0.025, 0.975})
+        sim_q = simulate_quantiles(
+            sarimax_res, max_h, all_q, n_paths=n_paths,
+            mean_adjust=None if resid_adj is None else resid_adj.values,
+            errors=errors, seed=intervals_cfg.get("seed"),
+        )
+        q_values = dict(zip(all_q, sim_q))
+        lower = pd.Series(q_values[0.025], index=fut_idx)
+        upper = pd.Series(q_values[0.975], index=fut_idx)
+    else:
+        lower = pd.Series(lower.values, index=fut_idx)
+        upper = pd.Series(upper.values, index=fut_idx)
+
     outputs = {}
     for h in horizons:
         idx = fut_idx[:h]
@@ -55,6 +90,9 @@ def forecast(
             "lower_95": lower.loc[idx].values,
             "upper_95": upper.loc[idx].values,
         })
+        for q in quantiles:
+            if q in q_values:
+                df[f"q{q * 100:g}"] = q_values[q][:h]
         df.to_csv(os.path.join(out_dir, f"{title_prefix}_{h}d.csv"), index=False)
         outputs[h] = df
 
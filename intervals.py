@@ -0,0 +1,73 @@
+
+from __future__ import annotations
+from typing import Optional, Sequence
+import numpy as np
+from statsmodels.tsa.statespace.sarimax import SARIMAXResults
+
+def _sqrt_cov(cov: np.ndarray) -> np.ndarray:
+    # Eigen square root tolerates the singular covariances of differenced/seasonal states
+    vals, vecs = np.linalg.eigh(np.atleast_2d(cov))
+    return vecs * np.sqrt(np.clip(vals, 0.0, None))
+
+def _last(fr, name: str) -> np.ndarray:
+    # System matrices carry a trailing time axis (length 1 when time-invariant)
+    m = np.asarray(getattr(fr, name))
+    ndim = 1 if name in ("obs_intercept", "state_intercept") else 2
+    return m[..., -1] if m.ndim > ndim else m
+
+def simulate_sarimax_paths(
+    res: SARIMAXResults,
+    steps: int,
+    n_paths: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Draw `n_paths` future sample paths from a fitted SARIMAX, shape (n_paths, steps).
+
+    All paths advance together through the state-space recursion, starting from the
+    one-step-ahead predicted state distribution at the end of the sample.
+    """
+    fr = res.filter_results
+    Z = _last(fr, "design")[0]
+    d = _last(fr, "obs_intercept")[0]
+    T = _last(fr, "transition")
+    c = _last(fr, "state_intercept")
+    R = _last(fr, "selection")
+    Q = _last(fr, "state_cov")
+    H = _last(fr, "obs_cov")[0, 0]
+
+    a0 = fr.predicted_state[:, -1]
+    P0 = fr.predicted_state_cov[:, :, -1]
+    k = len(a0)
+
+    state = a0[:, None] + _sqrt_cov(P0) @ rng.standard_normal((k, n_paths))
+    state_shock = R @ _sqrt_cov(Q)
+    eta = rng.standard_normal((steps, state_shock.shape[1], n_paths))
+    eps = rng.standard_normal((steps, n_paths)) * np.sqrt(max(H, 0.0))
+
+    paths = np.empty((steps, n_paths))
+    for t in range(steps):
+        paths[t] = Z @ state + d + eps[t]
+        state = T @ state + c[:, None] + state_shock @ eta[t]
+    return paths.T
+
+def simulate_quantiles(
+    res: SARIMAXResults,
+    steps: int,
+    quantiles: Sequence[float],
+    n_paths: int = 5000,
+    mean_adjust: Optional[np.ndarray] = None,
+    errors: Optional[np.ndarray] = None,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """Quantiles of the hybrid forecast distribution, shape (len(quantiles), steps).
+
+    SARIMAX sample paths are shifted by the XGBoost residual correction (`mean_adjust`)
+    and perturbed with bootstrapped, zero-mean holdout errors of that correction (`errors`).
+    """
+    rng = np.random.default_rng(seed)
+    paths = simulate_sarimax_paths(res, steps, n_paths, rng)
+    if mean_adjust is not None:
+        paths += np.asarray(mean_adjust)[None, :]
+    if errors is not None and len(errors):
+        paths += rng.choice(np.asarray(errors, dtype=np.float64), size=paths.shape)
+    return np.quantile(paths, quantiles, axis=0)
@@ -0,0 +1,108 @@
+
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .utils import load_config, today_str
+from .pipeline import run_pipeline
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    config_path: str
+    horizons: List[int]
+    artifacts_root: str
+    day: str = field(default_factory=today_str)
+    status: str = "queued"  # queued | running | done | failed
+    stage: str = "queued"
+    progress: float = 0.0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+def job_key(config_path: str, horizons: List[int]) -> str:
+    """Fingerprint of config file contents, price CSV contents and horizons."""
+    h = hashlib.sha256()
+    with open(config_path, 'rb') as f:
+        h.update(f.read())
+    price_csv = load_config(config_path).get("price_csv")
+    if price_csv and os.path.exists(price_csv):
+        with open(price_csv, 'rb') as f:
+            h.update(f.read())
+    h.update(repr(sorted(int(x) for x in horizons)).encode())
+    return h.hexdigest()
+
+class JobQueue:
+    """In-process training queue.
+
+    A single worker runs pipelines one at a time, so concurrent submissions never write
+    the same artifact folders together. Submitting a config+data pair that is already
+    queued or running, or that finished successfully today, returns the existing job
+    instead of starting another one.
+    """
+
+    def __init__(self, artifacts_root: str = "artifacts", max_workers: int = 1):
+        self.artifacts_root = artifacts_root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="basmati-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+
+    def submit(self, config_path: str, horizons: List[int]) -> Job:
+        horizons = [int(x) for x in horizons]
+        key = job_key(config_path, horizons)
+        with self._lock:
+            # The queue lives for the whole server process; forget finished jobs from earlier days
+            today = today_str()
+            self._jobs = {jid: j for jid, j in self._jobs.items() if j.active or j.day == today}
+            for job in self._jobs.values():
+                # Same inputs already in flight, or already trained today: reuse its artifacts
+                if job.key == key and (job.active or (job.status == "done" and job.day == today)):
+                    return job
+            job = Job(
+                id=uuid.uuid4().hex,
+                key=key,
+                config_path=config_path,
+                horizons=horizons,
+                artifacts_root=os.path.join(self.artifacts_root, "jobs", key[:12]),
+            )
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _update(self, job: Job, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                setattr(job, k, v)
+
+    def _run(self, job: Job):
+        self._update(job, status="running", stage="load")
+
+        def _progress(stage: str, frac: float):
+            self._update(job, stage=stage, progress=frac)
+
+        try:
+            result = run_pipeline(job.config_path, horizons=job.horizons,
+                                  artifacts_root=job.artifacts_root, progress=_progress)
+            # Keep only what the UI reads; the forecast frames are on disk under out_dir
+            result = {k: v for k, v in result.items() if k != "outputs"}
+            self._update(job, status="done", stage="done", progress=1.0, result=result,
+                         finished_at=time.time())
+        except Exception:
+            self._update(job, status="failed", error=traceback.format_exc(), finished_at=time.time())
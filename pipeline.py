@@ -1,8 +1,9 @@
 
 from __future__ import annotations
 import os
+import numpy as np
 import pandas as pd
-from typing import List, Optional
+from typing import Callable, List, Optional
 from dateutil.relativedelta import relativedelta
 
 from .utils import load_config, ensure_dir, today_str
@@ -13,8 +14,9 @@ from .features.weather import aggregate_regions
 from .model.train import train_models
 from .model.infer import forecast
 
-def build_features(price_s: pd.Series, cfg: dict) -> pd.DataFrame:
-    df = rolling_features(price_s)
+def build_exog_features(index: pd.DatetimeIndex, cfg: dict) -> pd.DataFrame:
+    """Indicator and weather columns (with lags) on a daily `index`, independent of any price series."""
+    ex = pd.DataFrame(index=index)
 
     ind_cfg = cfg.get("indicators", {})
     for key, meta in ind_cfg.items():
@@ -23,45 +25,77 @@ def build_features(price_s: pd.Series, cfg: dict) -> pd.DataFrame:
         s = fetch_yf(meta.get("ticker"), lookback_days=meta.get("lookback_days", 365))
         if s.empty:
             continue
-        s = s.reindex(df.index).ffill()
-        df[f"ind_{key}"] = s
+        s = s.reindex(index).ffill()
+        ex[f"ind_{key}"] = s
         for l in [1,3,7,14,30]:
-            df[f"ind_{key}_lag{l}"] = s.shift(l)
+            ex[f"ind_{key}_lag{l}"] = s.shift(l)
 
     w_cfg = cfg.get("weather", {})
     if w_cfg.get("enabled", False) and w_cfg.get("regions"):
-        wdf = aggregate_regions(w_cfg["regions"], past_days=max(365, len(df)))
-        wdf = wdf.reindex(df.index).ffill()
-        df = df.join(wdf, how="left")
+        # Cover the whole price history even when it ends before today
+        span_days = (pd.Timestamp.today().normalize() - index.min()).days + 1
+        wdf = aggregate_regions(w_cfg["regions"], past_days=max(365, span_days),
+                                cache_dir=w_cfg.get("cache_dir", "data/weather_cache"))
+        wdf = wdf.reindex(index).ffill()
+        ex = ex.join(wdf, how="left")
         for col in [c for c in wdf.columns if c.endswith("_avg")]:
             for l in [1,3,7,14]:
-                df[f"{col}_lag{l}"] = wdf[col].shift(l)
+                ex[f"{col}_lag{l}"] = wdf[col].shift(l)
+
+    return ex.astype(np.float32)
+
+def build_features(price_s: pd.Series, cfg: dict, exog: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Price-derived features joined with exogenous ones. Pass a precomputed `exog`
+    (from `build_exog_features`, covering the series' dates) to skip refetching it."""
+    df = rolling_features(price_s)
+    if exog is None:
+        exog = build_exog_features(df.index, cfg)
+    df = df.join(exog.reindex(df.index), how="left")
+
+    # Features are stored as float32 (half the memory); the target stays float64
+    return df.astype({c: np.float32 for c in df.columns if c != "price"})
 
-    return df
+# History rows the future builder needs: covers the longest lag/rolling window (30)
+# and lets the span-30 EMAs converge to the full-history values.
+FUTURE_WARMUP_DAYS = 400
 
-def make_future_features_builder(cfg: dict):
+def make_future_features_builder(cfg: dict, exog: Optional[pd.DataFrame] = None):
     def _builder(history_series: pd.Series, future_index: pd.DatetimeIndex) -> pd.DataFrame:
-        combined = history_series.copy()
+        # Only the tail of history affects the future rows, so don't rebuild the whole frame
+        combined = history_series.iloc[-FUTURE_WARMUP_DAYS:]
         if len(future_index):
             ext = pd.Series([combined.iloc[-1]] * len(future_index), index=future_index, name=combined.name)
             combined = pd.concat([combined, ext])
-        feats = build_features(combined, cfg).loc[future_index]
+        feats = build_features(combined, cfg, exog=exog).loc[future_index]
         feats = feats.drop(columns=['price'], errors='ignore').fillna(method='ffill').fillna(method='bfill')
         return feats
     return _builder
 
-def run_pipeline(config_path: str = "basmati/config.yaml", horizons: Optional[List[int]] = None):
+def run_pipeline(
+    config_path: str = "basmati/config.yaml",
+    horizons: Optional[List[int]] = None,
+    artifacts_root: str = "artifacts",
+    progress: Optional[Callable[[str, float], None]] = None,
+) -> dict:
+    """Train + forecast end to end. `progress(stage, fraction)` is called as each stage starts."""
+    def _report(stage: str, frac: float):
+        if progress is not None:
+            progress(stage, frac)
+
+    _report("load", 0.0)
     cfg = load_config(config_path)
     price_csv = cfg["price_csv"]
     price_s = load_price_csv(price_csv)
 
+    _report("features", 0.1)
     feats = build_features(price_s, cfg)
 
-    out_root = os.path.join("artifacts", today_str())
+    out_root = os.path.join(artifacts_root, today_str())
     ensure_dir(out_root)
-    models_dir = os.path.join("artifacts", "models")
+    models_dir = os.path.join(artifacts_root, "models")
     ensure_dir(models_dir)
 
+    _report("train", 0.3)
     tr = train_models(
         series=price_s,
         features=feats,
@@ -71,9 +105,10 @@ def run_pipeline(config_path: str = "basmati/config.yaml", horizons: Optional[Li
         test_size_days=cfg.get("model", {}).get("test_size_days", 60),
     )
 
+    _report("forecast", 0.7)
     hz = horizons or cfg.get("horizons", [7, 30, 180])
     fut_builder = make_future_features_builder(cfg)
-    forecast(
+    outputs = forecast(
         sarimax_path=tr.sarimax_model_path,
         xgb_path=tr.xgb_model_path,
         history_series=price_s,
@@ -81,6 +116,10 @@ def run_pipeline(config_path: str = "basmati/config.yaml", horizons: Optional[Li
         horizons=hz,
         out_dir=out_root,
         title_prefix="forecast",
+        correction_errors_path=tr.correction_errors_path,
+        intervals_cfg=cfg.get("model", {}).get("intervals", {}),
     )
+    _report("done", 1.0)
     print("Training metrics:", tr.metrics)
     print(f"Done. Artifacts at: {out_root}")
+    return {"out_dir": out_root, "metrics": tr.metrics, "horizons": list(hz), "outputs": outputs}
@@ -2,8 +2,10 @@
 import sys, pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parent))
 
+import os
+import pandas as pd
 import streamlit as st
-from basmati.pipeline import run_pipeline
+from basmati.jobs import JobQueue
 from basmati.data_sources.agmarknet_api import fetch_basmati_prices_csv
 from basmati.data_sources.data_gov_india import fetch_datagov_prices_csv
 
@@ -74,13 +76,65 @@ with c2:
 with c3:
     h3 = st.number_input("Horizon 3 (days)", min_value=1, value=180)
 
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    # Shared across sessions and reruns: one worker, deduplicated submissions
+    return JobQueue()
+
+@st.cache_data
+def load_forecast_csv(path: str, mtime: float) -> pd.DataFrame:
+    return pd.read_csv(path, parse_dates=["date"])
+
+@st.cache_data
+def load_plot_bytes(path: str, mtime: float) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+queue = get_job_queue()
+
 if st.button("Train & Forecast"):
-    with st.spinner("Training models and generating forecasts..."):
-        try:
-            run_pipeline("basmati/config.yaml", horizons=[h1, h2, h3])
-            st.success("Done! Check the artifacts/ folder for CSVs and plots.")
-            st.info("Outputs: artifacts/YYYY-MM-DD/forecast_{h}d.csv and PNG charts")
-        except Exception as e:
-            st.exception(e)
+    try:
+        job = queue.submit("basmati/config.yaml", horizons=[h1, h2, h3])
+        st.session_state["job_id"] = job.id
+    except Exception as e:
+        st.exception(e)
+
+@st.fragment(run_every=2)
+def job_progress(job_id: str):
+    # Polls only while the job is in flight; the finished panel renders outside this fragment
+    job = queue.get(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    st.progress(job.progress, text=f"Job {job.id[:8]}: {job.status} ({job.stage})")
+
+def job_results(job):
+    if job.status == "failed":
+        st.error("Training failed")
+        st.code(job.error)
+        return
+
+    out_dir = job.result["out_dir"]
+    st.success(f"Done! Artifacts at: {out_dir}")
+    st.json(job.result["metrics"], expanded=False)
+    for h in job.result["horizons"]:
+        csv_path = os.path.join(out_dir, f"forecast_{h}d.csv")
+        png_path = os.path.join(out_dir, f"forecast_plot_{h}d.png")
+        if not os.path.exists(csv_path):
+            continue
+        st.markdown(f"**{h}-day forecast**")
+        df = load_forecast_csv(csv_path, os.path.getmtime(csv_path))
+        if os.path.exists(png_path):
+            st.image(load_plot_bytes(png_path, os.path.getmtime(png_path)))
+        st.dataframe(df, use_container_width=True)
+        st.download_button(f"Download forecast_{h}d.csv", df.to_csv(index=False),
+                           file_name=f"forecast_{h}d.csv", key=f"dl_{job.id}_{h}")
+
+job_id = st.session_state.get("job_id")
+job = queue.get(job_id) if job_id else None
+if job is not None:
+    if job.active:
+        job_progress(job.id)
+    else:
+        job_results(job)
 
 st.caption("Tip: Replace data/basmati_prices.csv with your real time series (Date,Price).")
@@ -7,7 +7,7 @@ import pandas as pd
 import numpy as np
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from xgboost import XGBRegressor
+import xgboost
 import joblib
 
 @dataclass
@@ -15,6 +15,12 @@ class TrainResult:
     sarimax_model_path: str
     xgb_model_path: str | None
     metrics: dict
+    correction_errors_path: str | None = None
+    # Full-history models and their in-sample one-step residuals (start-up rows dropped),
+    # so callers can use them without reloading the pickles or rebuilding the feature matrix
+    sarimax: object = None
+    xgb: object = None
+    residuals: pd.Series | None = None
 
 def fit_sarimax(series: pd.Series, order=(1,1,1), seasonal_order=(0,1,1,7)):
     model = SARIMAX(series, order=order, seasonal_order=seasonal_order, enforce_stationarity=False, enforce_invertibility=False)
@@ -27,6 +33,41 @@ def time_series_metrics(y_true: pd.Series, y_pred: pd.Series) -> dict:
     mape = (np.abs((y_true - y_pred) / y_true).replace(np.inf, np.nan)).dropna().mean() * 100
     return {"MAE": float(mae), "RMSE": float(rmse), "MAPE_pct": float(mape)}
 
+def feature_matrix(series: pd.Series, features: pd.DataFrame) -> Tuple[np.ndarray, pd.Series, List[str]]:
+    """Build the float32 C-contiguous design matrix once, keeping only fully observed rows.
+    Returns (X, y, feature_names); y keeps the DatetimeIndex for SARIMAX.
+    """
+    cols = [c for c in features.columns if c != 'price']
+    y_all = series.reindex(features.index).to_numpy(dtype=np.float64)
+    mask = ~np.isnan(y_all)
+    for c in cols:
+        mask &= features[c].notna().to_numpy()
+    # Filled column by column so only the kept rows are ever materialised, with no
+    # intermediate masked frame or full-length copy alongside X
+    X = np.empty((int(mask.sum()), len(cols)), dtype=np.float32)
+    for j, c in enumerate(cols):
+        X[:, j] = features[c].to_numpy()[mask]
+    y = pd.Series(y_all[mask], index=features.index[mask], name='price')
+    return X, y, cols
+
+def _xgb_params(xgb_cfg: dict) -> dict:
+    return {
+        "max_depth": xgb_cfg.get("max_depth", 4),
+        "eta": xgb_cfg.get("learning_rate", 0.05),
+        "subsample": 0.9,
+        "colsample_bytree": 0.9,
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "seed": 42,
+    }
+
+def _fit_residuals(dmat: xgboost.DMatrix, resid: np.ndarray, params: dict, rounds: int) -> xgboost.Booster:
+    # Rows with a NaN fitted value get zero weight instead of being sliced out
+    ok = ~np.isnan(resid)
+    dmat.set_label(np.where(ok, resid, 0.0).astype(np.float32))
+    dmat.set_weight(ok.astype(np.float32))
+    return xgboost.train(params, dmat, num_boost_round=rounds)
+
 def train_models(
     series: pd.Series,
     features: pd.DataFrame,
@@ -37,15 +78,13 @@ def train_models(
 ) -> TrainResult:
     os.makedirs(artifacts_dir, exist_ok=True)
 
-    df = features.copy()
-    df['price'] = series
-    df = df.dropna()
-    y = df['price']
-    X = df.drop(columns=['price'])
+    X, y, feature_names = feature_matrix(series, features)
 
+    # Index is sorted, so train/test are contiguous row ranges and X slices are views
     cutoff = y.index.max() - pd.Timedelta(days=test_size_days)
-    y_train, y_test = y[y.index <= cutoff], y[y.index > cutoff]
-    X_train, X_test = X.loc[y_train.index], X.loc[y_test.index]
+    n_train = int(y.index.searchsorted(cutoff, side='right'))
+    y_train, y_test = y.iloc[:n_train], y.iloc[n_train:]
+    X_test = X[n_train:]
 
     sarimax_res = fit_sarimax(y_train, order=tuple(sarimax_cfg.get("order", (1,1,1))),
                               seasonal_order=tuple(sarimax_cfg.get("seasonal_order", (0,1,1,7))))
@@ -55,27 +94,34 @@ def train_models(
     metrics_base = time_series_metrics(y_test, base_pred_test)
 
     xgb_model_path = None
+    correction_errors_path = None
+    booster = None
     if xgb_cfg and xgb_cfg.get("enabled", True):
-        xgb = XGBRegressor(
-            n_estimators=xgb_cfg.get("n_estimators", 400),
-            max_depth=xgb_cfg.get("max_depth", 4),
-            learning_rate=xgb_cfg.get("learning_rate", 0.05),
-            subsample=0.9,
-            colsample_bytree=0.9,
-            objective="reg:squarederror",
-            random_state=42,
-        )
+        params = _xgb_params(xgb_cfg)
+        rounds = xgb_cfg.get("n_estimators", 400)
+        # Histogram cuts come from the train window only, so the holdout booster never sees
+        # test rows; the full-history matrix reuses those cuts via ref= instead of re-sketching.
+        dtrain = xgboost.QuantileDMatrix(X[:n_train], feature_names=feature_names)
+
         base_pred_train = sarimax_res.fittedvalues.reindex(y_train.index).ffill()
-        resid_train = (y_train - base_pred_train).dropna()
-        X_train_resid = X_train.loc[resid_train.index]
-        xgb.fit(X_train_resid, resid_train.values)
+        resid_train = (y_train - base_pred_train).to_numpy()
+        # The diffuse start-up rows have huge one-step errors that the booster would chase
+        resid_train[:sarimax_res.loglikelihood_burn] = np.nan
+        booster = _fit_residuals(dtrain, resid_train, params, rounds)
 
-        resid_test = y_test - base_pred_test
-        resid_pred_test = pd.Series(xgb.predict(X_test), index=X_test.index)
-        hybrid_pred_test = (base_pred_test + resid_pred_test).reindex(y_test.index)
+        resid_pred_test = pd.Series(booster.inplace_predict(X_test), index=y_test.index)
+        hybrid_pred_test = base_pred_test + resid_pred_test
         metrics_hybrid = time_series_metrics(y_test, hybrid_pred_test)
+        # Holdout error of the booster's correction alone: the one-step SARIMAX residual it
+        # targets (train-window params filtered through the test rows) minus its prediction.
+        # The multi-step SARIMAX error is already in the simulated paths, so it stays out.
+        resid_test = y_test - sarimax_res.apply(y).fittedvalues.iloc[n_train:]
+        correction_errors = (resid_test - resid_pred_test).to_numpy()
+        correction_errors = correction_errors[~np.isnan(correction_errors)]
+        # Centred on the median: the pool is skewed by a few large misses, and the simulated
+        # median has to stay on the point forecast
+        correction_errors -= np.median(correction_errors) if len(correction_errors) else 0.0
     else:
-        xgb = None
         metrics_hybrid = metrics_base
 
     sarimax_full = fit_sarimax(y, order=tuple(sarimax_cfg.get("order", (1,1,1))),
@@ -83,13 +129,22 @@ def train_models(
     sarimax_model_path = os.path.join(artifacts_dir, "sarimax.pkl")
     joblib.dump(sarimax_full, sarimax_model_path)
 
-    if xgb is not None:
-        base_fit_full = sarimax_full.fittedvalues.reindex(y.index).ffill()
-        resid_full = (y - base_fit_full).dropna()
-        X_full_resid = X.loc[resid_full.index]
-        xgb.fit(X_full_resid, resid_full.values)
+    base_fit_full = sarimax_full.fittedvalues.reindex(y.index).ffill()
+    resid_full = (y - base_fit_full).to_numpy()
+    resid_full[:sarimax_full.loglikelihood_burn] = np.nan
+    residuals = resid_full
+    if booster is not None:
+        dfull = xgboost.QuantileDMatrix(X, feature_names=feature_names, ref=dtrain)
+        booster = _fit_residuals(dfull, resid_full, params, rounds)
         xgb_model_path = os.path.join(artifacts_dir, "xgb.pkl")
-        joblib.dump(xgb, xgb_model_path)
+        joblib.dump(booster, xgb_model_path)
+        residuals = resid_full - booster.inplace_predict(X)
+        if len(correction_errors):
+            correction_errors_path = os.path.join(artifacts_dir, "correction_errors.npy")
+            np.save(correction_errors_path, correction_errors.astype(np.float32))
 
     metrics = {"baseline_SARIMAX": metrics_base, "hybrid": metrics_hybrid}
-    return TrainResult(sarimax_model_path=sarimax_model_path, xgb_model_path=xgb_model_path, metrics=metrics)
+    residuals = pd.Series(residuals, index=y.index).iloc[sarimax_full.loglikelihood_burn:]
+    return TrainResult(sarimax_model_path=sarimax_model_path, xgb_model_path=xgb_model_path, metrics=metrics,
+                       correction_errors_path=correction_errors_path, sarimax=sarimax_full, xgb=booster,
+                       residuals=residuals)
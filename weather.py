@@ -1,32 +1,126 @@
 
 from __future__ import annotations
+import datetime as dt
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import pandas as pd
 import requests
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+DAILY_VARS = "temperature_2m_mean,precipitation_sum"
+# The forecast API only serves this many past days; anything older comes from the archive
+FORECAST_MAX_PAST_DAYS = 92
 
-def fetch_weather_daily(lat: float, lon: float, past_days: int = 365) -> pd.DataFrame:
+def _daily_frame(data: dict) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": pd.to_datetime(data["daily"]["time"]),
+        "temp_mean": data["daily"]["temperature_2m_mean"],
+        "precip": data["daily"]["precipitation_sum"],
+    }).set_index("date")
+
+def fetch_weather_recent(lat: float, lon: float, past_days: int = 92) -> pd.DataFrame:
     params = {
         "latitude": lat,
         "longitude": lon,
-        "past_days": min(past_days, 92),
-        "daily": "temperature_2m_mean,precipitation_sum",
+        "past_days": min(past_days, FORECAST_MAX_PAST_DAYS),
+        "daily": DAILY_VARS,
         "timezone": "auto",
     }
     r = requests.get(OPEN_METEO_URL, params=params, timeout=30)
     r.raise_for_status()
-    data = r.json()
-    df = pd.DataFrame({
-        "date": pd.to_datetime(data["daily"]["time"]),
-        "temp_mean": data["daily"]["temperature_2m_mean"],
-        "precip": data["daily"]["precipitation_sum"],
-    }).set_index("date").asfreq("D").ffill()
+    return _daily_frame(r.json())
+
+def fetch_weather_archive(lat: float, lon: float, start: dt.date, end: dt.date) -> pd.DataFrame:
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "daily": DAILY_VARS,
+        "timezone": "auto",
+    }
+    r = requests.get(OPEN_METEO_ARCHIVE_URL, params=params, timeout=60)
+    r.raise_for_status()
+    return _daily_frame(r.json())
+
+def _year_chunks(start: dt.date, end: dt.date) -> List[Tuple[dt.date, dt.date]]:
+    chunks = []
+    while start <= end:
+        stop = min(end, start + dt.timedelta(days=364))
+        chunks.append((start, stop))
+        start = stop + dt.timedelta(days=1)
+    return chunks
+
+def backfill_weather(lat: float, lon: float, start: dt.date, end: dt.date, max_workers: int = 4) -> pd.DataFrame:
+    """Fetch [start, end] from the historical archive as year-sized requests in parallel."""
+    chunks = _year_chunks(start, end)
+    if not chunks:
+        return pd.DataFrame(columns=["temp_mean", "precip"], index=pd.DatetimeIndex([], name="date"))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as ex:
+        frames = list(ex.map(lambda c: fetch_weather_archive(lat, lon, *c), chunks))
+    return pd.concat(frames).sort_index()
+
+def _cache_path(cache_dir: str, lat: float, lon: float) -> str:
+    return os.path.join(cache_dir, f"weather_{lat:.4f}_{lon:.4f}.csv")
+
+def _load_cache(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, parse_dates=["date"], index_col="date")
+    return df if not df.empty else None
+
+def _merge(old: Optional[pd.DataFrame], new: pd.DataFrame) -> pd.DataFrame:
+    if old is None:
+        return new.sort_index()
+    # Newer fetches win where dates overlap (recent days get revised)
+    return new.combine_first(old).sort_index()
+
+def fetch_weather_daily(lat: float, lon: float, past_days: int = 365,
+                        cache_dir: Optional[str] = "data/weather_cache") -> pd.DataFrame:
+    """Daily weather for the last `past_days` days plus the short-range forecast.
+
+    With a `cache_dir`, observed days are kept on disk: history older than the cache is
+    backfilled from the archive API once, and afterwards only the days since the last
+    cached date are requested from the forecast API.
+    """
+    today = dt.date.today()
+    start = today - dt.timedelta(days=past_days)
+    path = _cache_path(cache_dir, lat, lon) if cache_dir else None
+    cached = _load_cache(path) if path else None
+
+    # Archive covers everything the forecast API can't reach
+    recent_start = today - dt.timedelta(days=FORECAST_MAX_PAST_DAYS)
+    if cached is None:
+        archive_ranges = [(start, recent_start - dt.timedelta(days=1))]
+        tail_days = min(past_days, FORECAST_MAX_PAST_DAYS)
+    else:
+        first, last = cached.index.min().date(), cached.index.max().date()
+        archive_ranges = [(start, first - dt.timedelta(days=1)),
+                          (last + dt.timedelta(days=1), recent_start - dt.timedelta(days=1))]
+        tail_days = (today - last).days
+
+    merged = cached
+    for a, b in archive_ranges:
+        if a <= b:
+            merged = _merge(merged, backfill_weather(lat, lon, a, b))
+    recent = fetch_weather_recent(lat, lon, past_days=max(tail_days, 1))
+    merged = _merge(merged, recent)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Only observed days are cached; forecast days are refetched on the next run
+        merged[merged.index < pd.Timestamp(today)].to_csv(path, index_label="date")
+
+    df = merged[merged.index >= pd.Timestamp(start)].asfreq("D").ffill()
     return df
 
-def aggregate_regions(regions, past_days: int = 365):
+def aggregate_regions(regions, past_days: int = 365, cache_dir: Optional[str] = "data/weather_cache"):
     frames = []
     for reg in regions:
-        df = fetch_weather_daily(reg["lat"], reg["lon"], past_days=past_days).add_prefix(f'{reg["name"]}_')
+        df = fetch_weather_daily(reg["lat"], reg["lon"], past_days=past_days,
+                                 cache_dir=cache_dir).add_prefix(f'{reg["name"]}_')
         frames.append(df)
     out = pd.concat(frames, axis=1).ffill()
     out["temp_mean_avg"] = out.filter(like="_temp_mean").mean(axis=1)